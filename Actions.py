@@ -1,40 +1,74 @@
 import pyautogui
 import os
+import cv2
+import numpy as np
+from dataclasses import dataclass
 from datetime import datetime
 import time
 import platform
+import threading
+
+@dataclass(frozen=True)
+class DeviceProfile:
+    """Screen layout of the BlueStacks window for one host setup (all values in screen pixels)"""
+    field: tuple                  # (left, top, right, bottom) of the arena
+    card_bar: tuple = None        # (left, top, width, height) of the hand
+    elixir_row: tuple = None      # (y, first_x, end_x, spacing) of the pip samples; None uses the elixir templates
+    battle_roi: tuple = (1486, 755, 1730 - 1486, 900 - 755)
+    winner_roi: tuple = (1510, 121, 1678 - 1510, 574 - 121)
+    matchover_roi: tuple = (1378, 335, 1808 - 1378, 411 - 335)
+    victory_min_y: int = 402      # 'Winner' found below this y means we won
+    play_again: tuple = (1522, 913)
+    clear_screen: tuple = (1705, 331)
+    window: tuple = None          # (left, top, width, height) to capture; must cover every region above. None grabs the whole screen
+
+MACOS_PROFILE = DeviceProfile(field=(1013, 120, 1480, 683))
+
+WINDOWS_PROFILE = DeviceProfile(
+    field=(1376, 120, 1838, 769),
+    card_bar=(1450, 847, 1862 - 1450, 971 - 847),
+    elixir_row=(989, 1512, 1892, 38),
+    window=(1376, 120, 1892 - 1376, 990 - 120),
+)
+
+PROFILES = {
+    "Darwin": MACOS_PROFILE,
+    "Windows": WINDOWS_PROFILE,
+}
 
 class Actions:
-    def __init__(self):
+    def __init__(self, profile=None):
         self.os_type = platform.system()
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.images_folder = os.path.join(self.script_dir, 'main_images')
 
-        # Define screen regions based on OS
-        if self.os_type == "Darwin":  # macOS
-            self.TOP_LEFT_X = 1013
-            self.TOP_LEFT_Y = 120
-            self.BOTTOM_RIGHT_X = 1480
-            self.BOTTOM_RIGHT_Y = 683
-            self.FIELD_AREA = (self.TOP_LEFT_X, self.TOP_LEFT_Y, self.BOTTOM_RIGHT_X, self.BOTTOM_RIGHT_Y)
-
-            self.WIDTH = self.BOTTOM_RIGHT_X - self.TOP_LEFT_X
-            self.HEIGHT = self.BOTTOM_RIGHT_Y - self.TOP_LEFT_Y
-        elif self.os_type == "Windows": # windows
-            self.TOP_LEFT_X = 1376
-            self.TOP_LEFT_Y = 120
-            self.BOTTOM_RIGHT_X = 1838
-            self.BOTTOM_RIGHT_Y = 769
-            self.FIELD_AREA = (self.TOP_LEFT_X, self.TOP_LEFT_Y, self.BOTTOM_RIGHT_X, self.BOTTOM_RIGHT_Y)
-            
-            self.WIDTH = self.BOTTOM_RIGHT_X - self.TOP_LEFT_X
-            self.HEIGHT = self.BOTTOM_RIGHT_Y - self.TOP_LEFT_Y
-            
-            # Add card bar coordinates for Windows
-            self.CARD_BAR_X = 1450
-            self.CARD_BAR_Y = 847
-            self.CARD_BAR_WIDTH = 1862 - 1450
-            self.CARD_BAR_HEIGHT = 971 - 847
+        # Screen regions come from the profile for this OS unless one is passed in
+        self.profile = profile or PROFILES.get(self.os_type)
+        if self.profile is None:
+            raise ValueError(f"No screen profile for {self.os_type}. Pass a DeviceProfile to Actions().")
+
+        self.TOP_LEFT_X, self.TOP_LEFT_Y, self.BOTTOM_RIGHT_X, self.BOTTOM_RIGHT_Y = self.profile.field
+        self.FIELD_AREA = self.profile.field
+        self.WIDTH = self.BOTTOM_RIGHT_X - self.TOP_LEFT_X
+        self.HEIGHT = self.BOTTOM_RIGHT_Y - self.TOP_LEFT_Y
+
+        if self.profile.card_bar:
+            self.CARD_BAR_X, self.CARD_BAR_Y, self.CARD_BAR_WIDTH, self.CARD_BAR_HEIGHT = self.profile.card_bar
+
+        # Elixir bar sample points, one per pip (None falls back to the elixir templates)
+        self._elixir_xs = None
+        if self.profile.elixir_row:
+            self.ELIXIR_Y, first_x, end_x, spacing = self.profile.elixir_row
+            self._elixir_xs = np.arange(first_x, end_x, spacing, dtype=np.intp)
+        # HSV band around the pip colour RGB (225, 128, 229), OpenCV hue 149:
+        # hue +/- 10, saturation > 80, value >= 150 (dark magenta-tinted pixels are not pips)
+        self._elixir_hsv_low = np.array([149 - 10, 81, 150], dtype=np.uint8)
+        self._elixir_hsv_high = np.array([149 + 10, 255, 255], dtype=np.uint8)
+
+        # Search regions (left, top, width, height) for the screen templates
+        self._battle_roi = self.profile.battle_roi
+        self._winner_roi = self.profile.winner_roi
+        self._matchover_roi = self.profile.matchover_roi
 
         # Card position to key mapping
         self.card_keys = {
@@ -47,10 +81,211 @@ class Actions:
         # Card name to position mapping (will be updated during detection)
         self.current_card_positions = {}
 
+        # Templates decoded once up front; detectors look them up by name
+        self._templates = self._load_templates()
+        # Half-resolution copies for the coarse matching pass
+        self._templates_half = {
+            name: tuple(cv2.resize(img, (w // 2, h // 2), interpolation=cv2.INTER_AREA) for img in (rgb, gray))
+            for name, (rgb, gray, h, w) in self._templates.items()
+        }
+        # How far below the lowest confidence a coarse score may be and still get refined.
+        # Half-resolution scores run up to ~0.2 under full-resolution ones for sharp true
+        # matches (a pixel-perfect okbutton at an odd offset scores 0.796), so the coarse
+        # pass only rejects; thresholds are always applied to the full-resolution score
+        self._coarse_margin = 0.25
+
+        # Last captured frame, shared by every detector within one tick. Only the
+        # profile window is grabbed; _origin is its top-left corner in screen pixels
+        self._capture_region = self.profile.window
+        self._origin = self._capture_region[:2] if self._capture_region else (0, 0)
+        self._frame = None
+        self._frame_ts = 0.0
+        self._frame_ttl = 0.1  # seconds
+        self._frame_lock = threading.Lock()
+        # Grayscale (full, half-resolution) versions of _frame, converted once per capture
+        self._gray_frames = None
+        self._gray_source = None
+
+        # Per-thread scratch arrays reused across matches (the end-game watcher runs on its own thread)
+        self._scratch = threading.local()
+
+        # Detectors skip work while the screen can't have changed meaningfully:
+        # after a miss, a popup check waits out its backoff before matching again
+        self._next_check = {"winner": 0.0, "matchover": 0.0}
+        self._miss_backoff = {"winner": 2.0, "matchover": 0.5}  # seconds
+        # Elixir regenerates about one pip per 2.8 s, so a reading stays usable briefly
+        self._elixir_cache = None  # (timestamp, count)
+        self._elixir_cache_ttl = 0.4  # seconds
+        # Template-based elixir reads: rows (top, height) of the bar once a template has matched there,
+        # tall enough for every elixir template plus some slack
+        self._elixir_band = None
+        self._elixir_band_height = max(
+            (gray.shape[0] for name, (_, gray, _, _) in self._templates.items() if name.endswith("elixir")), default=0
+        ) + 16
+
+    def _load_templates(self):
+        """
+        Read every PNG in images_folder as (rgb, gray, height, width), keyed by file stem.
+        Colour templates are swapped to RGB once here so screen frames never need converting.
+        """
+        templates = {}
+        for file_name in os.listdir(self.images_folder):
+            name, ext = os.path.splitext(file_name)
+            if ext.lower() != ".png":
+                continue
+            bgr = cv2.imread(os.path.join(self.images_folder, file_name), cv2.IMREAD_COLOR)
+            if bgr is None:
+                print(f"Error loading template {file_name}")
+                continue
+            gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+            templates[name] = (cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), gray, *gray.shape)
+        return templates
+
+    def take_screenshot(self, region=None):
+        """Grab the screen (or a (left, top, width, height) region) as an RGB numpy array"""
+        screenshot = pyautogui.screenshot(region=region)
+        if screenshot.mode != "RGB":
+            screenshot = screenshot.convert("RGB")
+        return np.asarray(screenshot)
+
+    def _grab(self):
+        """Return the cached screen frame, re-capturing once it is older than the TTL"""
+        with self._frame_lock:
+            now = time.monotonic()
+            if self._frame is None or now - self._frame_ts > self._frame_ttl:
+                self._frame = self.take_screenshot(region=self._capture_region)
+                self._frame_ts = now
+            return self._frame
+
+    def _gray(self):
+        """(full, half-resolution) grayscale copies of the cached frame, shared by every grayscale detector"""
+        frame = self._grab()
+        with self._frame_lock:
+            if self._gray_source is not frame:
+                gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+                half = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+                self._gray_frames = (gray, half)
+                self._gray_source = frame
+            return self._gray_frames
+
+    def _frames(self, grayscale=False):
+        """(full, half-resolution or None) frames from one capture, so a detector never mixes two"""
+        return self._gray() if grayscale else (self._grab(), None)
+
+    def _crop(self, left, top, width, height, frame=None):
+        """View of the cached frame (or a full-resolution copy of it) for a region given in screen pixels"""
+        if frame is None:
+            frame = self._grab()
+        origin_x, origin_y = self._origin
+        left, top = left - origin_x, top - origin_y
+        return frame[top:top + height, left:left + width]
+
+    def _buffer(self, key, shape, dtype=np.uint8):
+        """Return this thread's reusable scratch array for (key, shape), allocating it on first use"""
+        buffers = getattr(self._scratch, "buffers", None)
+        if buffers is None:
+            buffers = self._scratch.buffers = {}
+        buf = buffers.get((key, shape))
+        if buf is None:
+            buf = buffers[(key, shape)] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def _match(self, haystack, template):
+        """TM_CCOEFF_NORMED match written into a reused result buffer"""
+        shape = (haystack.shape[0] - template.shape[0] + 1, haystack.shape[1] - template.shape[1] + 1)
+        result = self._buffer("match", shape, np.float32)
+        return cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED, result=result)
+
+    def _prepare_match(self, template_name, frames, region=None, grayscale=False, half=False):
+        """
+        Return (haystack, template, left, top) for matching a template against frames (from _frames).
+        With half=True both are downscaled 2x; left/top stay in full-resolution screen pixels.
+        """
+        frame, frame_half = frames
+        left, top = self._origin
+        if region:
+            origin_x, origin_y = self._origin
+            frame_h, frame_w = frame.shape[:2]
+            left, top, width, height = region
+            assert left >= origin_x and top >= origin_y and \
+                left + width <= origin_x + frame_w and top + height <= origin_y + frame_h, \
+                f"Search region {region} for {template_name} is outside the captured {frame_w}x{frame_h} frame at {self._origin}"
+            # Slicing is a view, so only the region is downscaled and matched
+            frame = self._crop(*region, frame=frame)
+
+        if half:
+            if region is None and frame_half is not None:
+                frame = frame_half
+            else:
+                half_h, half_w = frame.shape[0] // 2, frame.shape[1] // 2
+                frame = cv2.resize(
+                    frame, (half_w, half_h), dst=self._buffer("half", (half_h, half_w) + frame.shape[2:]),
+                    interpolation=cv2.INTER_AREA
+                )
+            template_rgb, template_gray = self._templates_half[template_name]
+            template_h, template_w = template_gray.shape
+        else:
+            template_rgb, template_gray, template_h, template_w = self._templates[template_name]
+        # Colour frames and templates are both RGB, so either way the haystack is used as-is
+        template = template_gray if grayscale else template_rgb
+        haystack = frame
+
+        if haystack.shape[0] < template_h or haystack.shape[1] < template_w:
+            raise ValueError(f"Template {template_name} is larger than the search region")
+        return haystack, template, left, top
+
+    def _find_template(self, template_name, confidences, region=None, grayscale=False, frames=None):
+        """
+        Locate a template in the cached frame.
+        A half-resolution pass rejects misses cheaply; a hit is refined at full resolution
+        in a small window, and that score is compared against each confidence (highest
+        first). Returns ((x, y), confidence) for the match center, or None.
+        frames lets a caller probing several templates reuse one capture.
+        """
+        if frames is None:
+            frames = self._frames(grayscale)
+        haystack, template, left, top = self._prepare_match(template_name, frames, region, grayscale, half=True)
+        coarse = self._match(haystack, template)
+        _, coarse_val, _, coarse_loc = cv2.minMaxLoc(coarse)
+        if coarse_val < min(confidences) - self._coarse_margin:
+            return None
+
+        # Refine in a window around the coarse hit, clamped to the search region
+        _, _, template_h, template_w = self._templates[template_name]
+        frame_h, frame_w = frames[0].shape[:2]
+        region_x, region_y, region_w, region_h = region or (*self._origin, frame_w, frame_h)
+        pad = 4
+        window_x = min(max(region_x, left + coarse_loc[0] * 2 - pad), region_x + region_w - template_w)
+        window_y = min(max(region_y, top + coarse_loc[1] * 2 - pad), region_y + region_h - template_h)
+        window = (
+            window_x,
+            window_y,
+            min(region_x + region_w, window_x + template_w + 2 * pad) - window_x,
+            min(region_y + region_h, window_y + template_h + 2 * pad) - window_y,
+        )
+
+        haystack, template, left, top = self._prepare_match(template_name, frames, window, grayscale)
+        result = self._match(haystack, template)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        for confidence in sorted(confidences, reverse=True):
+            if max_val >= confidence:
+                center = (left + max_loc[0] + template_w // 2, top + max_loc[1] + template_h // 2)
+                return center, confidence
+        return None
+
+    def _template_exists(self, template_name, region=None, threshold=0.8, grayscale=False):
+        """Presence-only check: True when the full-resolution score reaches threshold"""
+        return self._find_template(template_name, [threshold], region, grayscale) is not None
+
     def capture_area(self, save_path):
         screenshot = pyautogui.screenshot(region=(self.TOP_LEFT_X, self.TOP_LEFT_Y, self.WIDTH, self.HEIGHT))
         screenshot.save(save_path)
 
+    def capture_field(self):
+        """Arena region of the cached frame as a BGR array, the order the inference client expects"""
+        field = self._crop(self.TOP_LEFT_X, self.TOP_LEFT_Y, self.WIDTH, self.HEIGHT)
+        return cv2.cvtColor(field, cv2.COLOR_RGB2BGR)
+
     def capture_card_area(self, save_path):
         """Capture screenshot of card area"""
         screenshot = pyautogui.screenshot(region=(
@@ -61,51 +296,73 @@ class Actions:
         ))
         screenshot.save(save_path)
 
-    def capture_individual_cards(self):
-        """Capture and split card bar into individual card images"""
-        screenshot = pyautogui.screenshot(region=(
-            self.CARD_BAR_X, 
-            self.CARD_BAR_Y, 
-            self.CARD_BAR_WIDTH, 
-            self.CARD_BAR_HEIGHT
-        ))
-        
+    def capture_individual_cards(self, save=True):
+        """
+        Split the card bar of the cached frame into individual card images.
+        Returns the saved file paths, or the BGR card arrays when save=False
+        (ready to hand straight to the inference client).
+        """
+        card_bar = self._crop(self.CARD_BAR_X, self.CARD_BAR_Y, self.CARD_BAR_WIDTH, self.CARD_BAR_HEIGHT)
+
         # Calculate individual card widths
         card_width = self.CARD_BAR_WIDTH // 4
-        cards = []
-        
-        # Split into 4 individual card images
-        for i in range(4):
-            left = i * card_width
-            card_img = screenshot.crop((left, 0, left + card_width, self.CARD_BAR_HEIGHT))
+        cards = [
+            cv2.cvtColor(card_bar[:, i * card_width:(i + 1) * card_width], cv2.COLOR_RGB2BGR)
+            for i in range(4)
+        ]
+        if not save:
+            return cards
+
+        card_paths = []
+        for i, card_img in enumerate(cards):
             save_path = os.path.join(self.script_dir, 'screenshots', f"card_{i+1}.png")
-            card_img.save(save_path)
-            cards.append(save_path)
-        
-        return cards
+            cv2.imwrite(save_path, card_img)
+            card_paths.append(save_path)
+        return card_paths
 
     def count_elixir(self):
-        if self.os_type == "Darwin":
+        now = time.monotonic()
+        if self._elixir_cache is not None and now - self._elixir_cache[0] < self._elixir_cache_ttl:
+            return self._elixir_cache[1]
+        count = self._read_elixir()
+        self._elixir_cache = (now, count)
+        return count
+
+    def _read_elixir(self):
+        if self._elixir_xs is None:
+            # The bar never moves, so after the first hit only its band of rows is searched.
+            # Every template is probed against the same capture
+            frames = self._frames(grayscale=True)
+            frame_h, frame_w = frames[0].shape[:2]
+            origin_x, origin_y = self._origin
+            region = None
+            if self._elixir_band is not None:
+                band_top, band_height = self._elixir_band
+                region = (origin_x, band_top, frame_w, band_height)
             for i in range(10, 0, -1):
-                image_file = os.path.join(self.images_folder, f"{i}elixir.png")
+                template_name = f"{i}elixir"
                 try:
-                    location = pyautogui.locateOnScreen(image_file, confidence=0.5, grayscale=True)
-                    if location:
+                    match = self._find_template(template_name, [0.5], region, grayscale=True, frames=frames)
+                    if match:
+                        if self._elixir_band is None:
+                            (_, center_y), _ = match
+                            band_height = self._elixir_band_height
+                            band_top = min(max(origin_y, center_y - band_height // 2), origin_y + frame_h - band_height)
+                            self._elixir_band = (band_top, band_height)
                         return i
                 except Exception as e:
-                    print(f"Error locating {image_file}: {e}")
+                    print(f"Error locating {template_name}: {e}")
+            # Nothing matched, possibly because the band was wrong: search the whole frame next time
+            self._elixir_band = None
             return 0
-        elif self.os_type == "Windows":
-            target = (225, 128, 229)
-            tolerance = 80
-            count = 0
-            for x in range(1512, 1892, 38):
-                r, g, b = pyautogui.pixel(x, 989)
-                if (abs(r - target[0]) <= tolerance) and (abs(g - target[1]) <= tolerance) and (abs(b - target[2]) <= tolerance):
-                    count += 1
-            return count
         else:
-            return 0
+            # Sample every pip at once as a 1 x N row and test hue + saturation above a
+            # brightness floor, which holds up under lighting changes better than an RGB box
+            origin_x, origin_y = self._origin
+            row = self._grab()[self.ELIXIR_Y - origin_y:self.ELIXIR_Y - origin_y + 1, self._elixir_xs - origin_x]
+            hsv = cv2.cvtColor(row, cv2.COLOR_RGB2HSV)
+            count = cv2.countNonZero(cv2.inRange(hsv, self._elixir_hsv_low, self._elixir_hsv_high))
+            return min(count, 10)
 
     def update_card_positions(self, detections):
         """
@@ -121,98 +378,96 @@ class Actions:
             for idx, card in enumerate(sorted_cards)
         }
 
+    def click(self, x, y, pause=True):
+        """
+        Click at (x, y) in one call; no tweened mouse move, so at most one pyautogui pause is paid.
+        pause=False skips pyautogui.PAUSE for callers that sequence their own delays.
+        """
+        pyautogui.click(x, y, _pause=pause)
+
     def card_play(self, x, y, card_index):
         print(f"Playing card {card_index} at position ({x}, {y})")
         if card_index in self.card_keys:
             key = self.card_keys[card_index]
+            self._elixir_cache = None  # Playing a card spends elixir immediately
             print(f"Pressing key: {key}")
-            pyautogui.press(key)
+            # Select + place is one burst: the only delay is the explicit one for the card to lift
+            pyautogui.press(key, _pause=False)
             time.sleep(0.2)
-            print(f"Moving mouse to: ({x}, {y})")
-            pyautogui.moveTo(x, y, duration=0.2)
-            print("Clicking")
-            pyautogui.click()
+            print(f"Clicking at: ({x}, {y})")
+            self.click(x, y, pause=False)
         else:
             print(f"Invalid card index: {card_index}")
 
     def click_battle_start(self):
-        button_image = os.path.join(self.images_folder, "battlestartbutton.png")
         confidences = [0.8, 0.7, 0.6, 0.5]  # Try multiple confidence levels
 
-        # Define the region (left, top, width, height) for the correct battle button
-        battle_button_region = (1486, 755, 1730-1486, 900-755)
-
         while True:
-            for confidence in confidences:
-                print(f"Looking for battle start button (confidence: {confidence})")
-                try:
-                    location = pyautogui.locateOnScreen(
-                        button_image,
-                        confidence=confidence,
-                        region=battle_button_region  # Only search in this region
-                    )
-                    if location:
-                        x, y = pyautogui.center(location)
-                        print(f"Found battle start button at ({x}, {y})")
-                        pyautogui.moveTo(x, y, duration=0.2)
-                        pyautogui.click()
-                        return True
-                except:
-                    pass
+            print(f"Looking for battle start button (confidences: {confidences})")
+            try:
+                match = self._find_template(
+                    "battlestartbutton",
+                    confidences,
+                    region=self._battle_roi  # Only search in this region
+                )
+                if match:
+                    (x, y), confidence = match
+                    print(f"Found battle start button at ({x}, {y}) with confidence {confidence}")
+                    self.click(x, y)
+                    return True
+            except Exception as e:
+                print(f"Error locating battle start button: {e}")
 
             # If button not found, click to clear screens
             print("Button not found, clicking to clear screens...")
-            pyautogui.moveTo(1705, 331, duration=0.2)
-            pyautogui.click()
+            self.click(*self.profile.clear_screen)
             time.sleep(1)
 
     def detect_game_end(self):
+        now = time.monotonic()
+        if now < self._next_check["winner"]:
+            return None
         try:
-            winner_img = os.path.join(self.images_folder, "Winner.png")
             confidences = [0.8, 0.7, 0.6]
 
-            winner_region = (1510, 121, 1678-1510, 574-121)
+            winner_match = None
 
-            for confidence in confidences:
-                print(f"\nTrying detection with confidence: {confidence}")
-                winner_location = None
+            # Try to find Winner in region
+            try:
+                winner_match = self._find_template(
+                    "Winner", confidences, region=self._winner_roi, grayscale=True
+                )
+            except Exception as e:
+                print(f"Error locating Winner: {str(e)}")
 
-                # Try to find Winner in region
-                try:
-                    winner_location = pyautogui.locateOnScreen(
-                        winner_img, confidence=confidence, grayscale=True, region=winner_region
-                    )
-                except Exception as e:
-                    print(f"Error locating Winner: {str(e)}")
-
-                if winner_location:
-                    _, y = pyautogui.center(winner_location)
-                    print(f"Found 'Winner' at y={y} with confidence {confidence}")
-                    result = "victory" if y > 402 else "defeat"
-                    time.sleep(3)
-                    # Click the "Play Again" button at a fixed coordinate (adjust as needed)
-                    play_again_x, play_again_y = 1522, 913  # Example coordinates
-                    print(f"Clicking Play Again at ({play_again_x}, {play_again_y})")
-                    pyautogui.moveTo(play_again_x, play_again_y, duration=0.2)
-                    pyautogui.click()
-                    return result
+            if winner_match:
+                self._next_check["winner"] = 0.0
+                (_, y), confidence = winner_match
+                print(f"Found 'Winner' at y={y} with confidence {confidence}")
+                result = "victory" if y > self.profile.victory_min_y else "defeat"
+                time.sleep(3)
+                # Click the "Play Again" button at a fixed coordinate (adjust as needed)
+                play_again_x, play_again_y = self.profile.play_again
+                print(f"Clicking Play Again at ({play_again_x}, {play_again_y})")
+                self.click(play_again_x, play_again_y)
+                return result
         except Exception as e:
             print(f"Error in game end detection: {str(e)}")
+        self._next_check["winner"] = now + self._miss_backoff["winner"]
         return None
 
     def detect_match_over(self):
-        matchover_img = os.path.join(self.images_folder, "matchover.png")
-        confidences = [0.8, 0.6, 0.4]
-        # Define the region where the matchover image appears (adjust as needed)
-        region = (1378, 335, 1808-1378, 411-335)
-        for confidence in confidences:
-            try:
-                location = pyautogui.locateOnScreen(
-                    matchover_img, confidence=confidence, grayscale=True, region=region
-                )
-                if location:
-                    print("Match over detected!")
-                    return True
-            except Exception as e:
-                print(f"Error locating matchover.png: {e}")
+        now = time.monotonic()
+        if now < self._next_check["matchover"]:
+            return False
+        # Presence is all that matters, so only the loosest confidence needs testing
+        threshold = 0.4
+        try:
+            if self._template_exists("matchover", self._matchover_roi, threshold, grayscale=True):
+                print("Match over detected!")
+                self._next_check["matchover"] = 0.0
+                return True
+        except Exception as e:
+            print(f"Error locating matchover.png: {e}")
+        self._next_check["matchover"] = now + self._miss_backoff["matchover"]
         return False
\ No newline at end of file
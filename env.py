@@ -1,8 +1,10 @@
 import numpy as np
 import time
 import os
-import pyautogui
 import threading
+import concurrent.futures
+import hashlib
+from collections import OrderedDict
 from dotenv import load_dotenv
 from Actions import Actions
 from inference_sdk import InferenceHTTPClient
@@ -10,23 +12,67 @@ from inference_sdk import InferenceHTTPClient
 # Load environment variables from .env file
 load_dotenv()
 
+# Set CRBOT_DEBUG=1 in .env to print the raw detection output on every step
+DEBUG = os.getenv('CRBOT_DEBUG') == '1'
+
 MAX_ENEMIES = 10
 MAX_ALLIES = 10
 
 SPELL_CARDS = ["Fireball", "Zap", "Arrows", "Tornado", "Rocket", "Lightning", "Freeze"]
 
+# Troop detector classes grouped into small integer ids
+OTHER, ALLY_UNIT, ENEMY_UNIT, TOWER, ENEMY_PRINCESS_TOWER = -1, 0, 1, 2, 3
+
+TOWER_CLASSES = {
+    "ally king tower",
+    "ally princess tower",
+    "enemy king tower",
+    "enemy princess tower"
+}
+
+_class_ids = {}
+
+def class_id(cls):
+    """Group id for a raw detector class name; each distinct name is only parsed once"""
+    if not isinstance(cls, str):
+        return OTHER
+    cid = _class_ids.get(cls)
+    if cid is None:
+        name = cls.strip().lower()
+        if name == "enemy princess tower":
+            cid = ENEMY_PRINCESS_TOWER
+        elif name in TOWER_CLASSES:
+            cid = TOWER
+        elif name.startswith("ally"):
+            cid = ALLY_UNIT
+        elif name.startswith("enemy"):
+            cid = ENEMY_UNIT
+        else:
+            cid = OTHER
+        _class_ids[cls] = cid
+    return cid
+
 class ClashRoyaleEnv:
     def __init__(self):
         self.actions = Actions()
-        self.rf_model = self.setup_roboflow()
-        self.card_model = self.setup_card_roboflow()
+        # Both workflows live on the same local inference server, so one client serves them
+        self.client = self.setup_roboflow()
+
+        # Workflow workspaces are read once, so a missing one fails here rather than mid-episode
+        self.troop_workspace = os.getenv('WORKSPACE_TROOP_DETECTION')
+        if not self.troop_workspace:
+            raise ValueError("WORKSPACE_TROOP_DETECTION environment variable is not set. Please check your .env file.")
+        self.card_workspace = os.getenv('WORKSPACE_CARD_DETECTION')
+        if not self.card_workspace:
+            raise ValueError("WORKSPACE_CARD_DETECTION environment variable is not set. Please check your .env file.")
         self.state_size = 1 + 2 * (MAX_ALLIES + MAX_ENEMIES)
+        # The field size is fixed, so normalizing is a multiply by its reciprocal
+        self._inv_field = np.array([1.0 / self.actions.WIDTH, 1.0 / self.actions.HEIGHT], dtype=np.float32)
 
         self.num_cards = 4
         self.grid_width = 18
         self.grid_height = 28
 
-        self.screenshot_path = os.path.join(os.path.dirname(__file__), 'screenshots', "current.png")
         self.available_actions = self.get_available_actions()
         self.action_size = len(self.available_actions)
         self.current_cards = []
@@ -40,19 +86,26 @@ class ClashRoyaleEnv:
 
         self.prev_enemy_princess_towers = None
 
+        # Troop predictions from the latest _get_state, so other counts reuse that inference
+        self.last_predictions = []
+        # Enemy troops from the latest _get_state in field pixels, one (x, y) int16 row each
+        self._enemy_xy = np.zeros((MAX_ENEMIES, 2), dtype=np.int16)
+        self._enemy_count = 0
+
         self.match_over_detected = False
 
-    def setup_roboflow(self):
-        api_key = os.getenv('ROBOFLOW_API_KEY')
-        if not api_key:
-            raise ValueError("ROBOFLOW_API_KEY environment variable is not set. Please check your .env file.")
-        
-        return InferenceHTTPClient(
-            api_url="http://localhost:9001",
-            api_key=api_key
-        )
+        # Card detection (one batched workflow call) runs here while the main thread builds
+        # the state. Only one is pending at a time; two only briefly, if reset() replaces one
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self._cards_future = None
+
+        # Recent workflow outputs keyed by a digest of the exact pixels sent, so an
+        # unchanged screen region skips the round-trip to the inference server
+        self._results_cache = OrderedDict()
+        self._results_cache_size = 8
+        self._results_lock = threading.Lock()
 
-    def setup_card_roboflow(self):
+    def setup_roboflow(self):
         api_key = os.getenv('ROBOFLOW_API_KEY')
         if not api_key:
             raise ValueError("ROBOFLOW_API_KEY environment variable is not set. Please check your .env file.")
@@ -72,28 +125,36 @@ class ClashRoyaleEnv:
         self._endgame_thread.start()
         self.prev_elixir = None
         self.prev_enemy_presence = None
-        self.prev_enemy_princess_towers = self._count_enemy_princess_towers()
         self.match_over_detected = False
-        return self._get_state()
+        # Detect the opening hand while the first state is being built
+        self._cards_future = self._pool.submit(self.detect_cards_in_hand)
+        # The opening tower count comes from the same frame and inference as the first state
+        state = self._get_state()
+        self.prev_enemy_princess_towers = self._count_enemy_princess_towers(self.last_predictions)
+        return state
 
     def close(self):
         self._endgame_thread_stop.set()
         if self._endgame_thread:
             self._endgame_thread.join()
+        self._pool.shutdown(wait=False)
 
     def step(self, action_index):
-        # Check for match over
-        if not self.match_over_detected and hasattr(self.actions, "detect_match_over") and self.actions.detect_match_over():
+        # Check for match over (pointless once the watcher has seen the result screen;
+        # detect_match_over rate-limits itself between misses)
+        if (
+            not self.game_over_flag
+            and not self.match_over_detected
+            and hasattr(self.actions, "detect_match_over")
+            and self.actions.detect_match_over()
+        ):
             print("Match over detected (matchover.png), forcing no-op until next game.")
             self.match_over_detected = True
 
-        # If match over, only allow no-op action (last action in list)
-        if self.match_over_detected:
-            action_index = len(self.available_actions) - 1  # No-op action
-
         if self.game_over_flag:
             done = True
-            reward = self._compute_reward(self._get_state())
+            state = self._get_state()
+            reward = self._compute_reward(state)
             result = self.game_over_flag
             if result == "victory":
                 reward += 100
@@ -102,25 +163,34 @@ class ClashRoyaleEnv:
                 reward -= 100
                 print("Defeat detected - ending episode")
             self.match_over_detected = False  # Reset for next episode
-            return self._get_state(), reward, done
-
-        self.current_cards = self.detect_cards_in_hand()
-        print("\nCurrent cards in hand:", self.current_cards)
-
-        # If all cards are "Unknown", click at (1611, 831) and return no-op
-        if all(card == "Unknown" for card in self.current_cards):
-            print("All cards are Unknown, clicking at (1611, 831) and skipping move.")
-            pyautogui.moveTo(1611, 831, duration=0.2)
-            pyautogui.click()
-            # Return current state, zero reward, not done
-            next_state = self._get_state()
-            return next_state, 0, False
-
-        action = self.available_actions[action_index]
-        card_index, x_frac, y_frac = action
+            return state, reward, done
+
+        if self.match_over_detected:
+            # If match over, only allow no-op action (last action in list); the hand
+            # can't be played, so skip card detection entirely
+            action_index = len(self.available_actions) - 1  # No-op action
+        else:
+            if self._cards_future is not None:
+                self.current_cards = self._cards_future.result()
+                self._cards_future = None
+            else:
+                self.current_cards = self.detect_cards_in_hand()
+            print("\nCurrent cards in hand:", self.current_cards)
+
+            # If all cards are "Unknown", click at (1611, 831) and return no-op
+            if all(card == "Unknown" for card in self.current_cards):
+                print("All cards are Unknown, clicking at (1611, 831) and skipping move.")
+                self.actions.click(1611, 831)
+                # Return current state, zero reward, not done
+                next_state = self._get_state()
+                return next_state, 0, False
+
+        card_index, x_frac, y_frac = self.available_actions[action_index]
+        card_index = int(card_index)
         print(f"Action selected: card_index={card_index}, x_frac={x_frac:.2f}, y_frac={y_frac:.2f}")
 
         spell_penalty = 0
+        settle_at = time.monotonic()
 
         if card_index != -1 and card_index < len(self.current_cards):
             card_name = self.current_cards[card_index]
@@ -128,26 +198,28 @@ class ClashRoyaleEnv:
             x = int(x_frac * self.actions.WIDTH) + self.actions.TOP_LEFT_X
             y = int(y_frac * self.actions.HEIGHT) + self.actions.TOP_LEFT_Y
             self.actions.card_play(x, y, card_index)
-            time.sleep(1)  # You can reduce this if needed
+            settle_at = time.monotonic() + 1.0  # Let the card land before looking at the screen again
 
             # --- Spell penalty logic ---
             if card_name in SPELL_CARDS:
-                state = self._get_state()
-                enemy_positions = []
-                for i in range(1 + 2 * MAX_ALLIES, 1 + 2 * MAX_ALLIES + 2 * MAX_ENEMIES, 2):
-                    ex = state[i]
-                    ey = state[i + 1]
-                    if ex != 0.0 or ey != 0.0:
-                        ex_px = int(ex * self.actions.WIDTH)
-                        ey_px = int(ey * self.actions.HEIGHT)
-                        enemy_positions.append((ex_px, ey_px))
+                # Judge the spell against the enemies on screen when it was cast
+                enemies = self._enemy_xy[:self._enemy_count]
+                # Field-relative pixels on both sides; int32 so squared distances can't overflow
+                target = np.array([x - self.actions.TOP_LEFT_X, y - self.actions.TOP_LEFT_Y], dtype=np.int32)
                 radius = 100
-                found_enemy = any((abs(ex - x) ** 2 + abs(ey - y) ** 2) ** 0.5 < radius for ex, ey in enemy_positions)
+                found_enemy = bool((((enemies - target) ** 2).sum(axis=1) < radius ** 2).any())
                 if not found_enemy:
                     spell_penalty = -5  # Penalize for wasting spell
 
+        # The hand only changes when we play a card, so detect the next step's cards on
+        # the pool while this thread builds the state; both wait out the settle delay
+        if not self.match_over_detected:
+            self._cards_future = self._pool.submit(self._call_at, settle_at, self.detect_cards_in_hand)
+        state = self._call_at(settle_at, self._get_state)
+
         # --- Princess tower reward logic ---
-        current_enemy_princess_towers = self._count_enemy_princess_towers()
+        # Count from the predictions _get_state just made instead of running inference again
+        current_enemy_princess_towers = self._count_enemy_princess_towers(self.last_predictions)
         princess_tower_reward = 0
         if self.prev_enemy_princess_towers is not None:
             if current_enemy_princess_towers < self.prev_enemy_princess_towers:
@@ -155,25 +227,19 @@ class ClashRoyaleEnv:
         self.prev_enemy_princess_towers = current_enemy_princess_towers
 
         done = False
-        reward = self._compute_reward(self._get_state()) + spell_penalty + princess_tower_reward
-        next_state = self._get_state()
-        return next_state, reward, done
+        reward = self._compute_reward(state) + spell_penalty + princess_tower_reward
+        # The reward was computed from this frame, so it doubles as the next state
+        return state, reward, done
 
     def _get_state(self):
-        self.actions.capture_area(self.screenshot_path)
+        # The arena goes to the inference server straight from memory, no PNG round-trip
+        field = self.actions.capture_field()
         elixir = self.actions.count_elixir()
-        
-        workspace_name = os.getenv('WORKSPACE_TROOP_DETECTION')
-        if not workspace_name:
-            raise ValueError("WORKSPACE_TROOP_DETECTION environment variable is not set. Please check your .env file.")
-        
-        results = self.rf_model.run_workflow(
-            workspace_name=workspace_name,
-            workflow_id="detect-count-and-visualize",
-            images={"image": self.screenshot_path}
-        )
 
-        print("RAW results:", results)
+        results = self._run_workflow(self.troop_workspace, "detect-count-and-visualize", field)
+
+        if DEBUG:
+            print("RAW results:", results)
 
         # Handle new structure: dict with "predictions" key
         predictions = []
@@ -183,84 +249,89 @@ class ClashRoyaleEnv:
             first = results[0]
             if isinstance(first, dict) and "predictions" in first:
                 predictions = first["predictions"]
-        print("Predictions:", predictions)
+        if DEBUG:
+            print("Predictions:", predictions)
         if not predictions:
             print("WARNING: No predictions found in results")
+            self.last_predictions = []
+            self._enemy_count = 0
             return None
 
         # After getting 'predictions' from results:
         if isinstance(predictions, dict) and "predictions" in predictions:
             predictions = predictions["predictions"]
 
-        print("RAW predictions:", predictions)
-        print("Detected classes:", [repr(p.get("class", "")) for p in predictions if isinstance(p, dict)])
-
-        TOWER_CLASSES = {
-            "ally king tower",
-            "ally princess tower",
-            "enemy king tower",
-            "enemy princess tower"
-        }
-
-        def normalize_class(cls):
-            return cls.strip().lower() if isinstance(cls, str) else ""
-
-        allies = [
-            (p["x"], p["y"])
-            for p in predictions
-            if (
-                isinstance(p, dict)
-                and normalize_class(p.get("class", "")) not in TOWER_CLASSES
-                and normalize_class(p.get("class", "")).startswith("ally")
-                and "x" in p and "y" in p
-            )
-        ]
-
-        enemies = [
-            (p["x"], p["y"])
-            for p in predictions
-            if (
-                isinstance(p, dict)
-                and normalize_class(p.get("class", "")) not in TOWER_CLASSES
-                and normalize_class(p.get("class", "")).startswith("enemy")
-                and "x" in p and "y" in p
-            )
-        ]
-
-        print("Allies:", allies)
-        print("Enemies:", enemies)
-
-        # Normalize positions
-        def normalize(units):
-            return [(x / self.actions.WIDTH, y / self.actions.HEIGHT) for x, y in units]
-
-        # Pad or truncate to fixed length
-        def pad_units(units, max_units):
-            units = normalize(units)
-            if len(units) < max_units:
-                units += [(0.0, 0.0)] * (max_units - len(units))
-            return units[:max_units]
-
-        ally_positions = pad_units(allies, MAX_ALLIES)
-        enemy_positions = pad_units(enemies, MAX_ENEMIES)
-
-        # Flatten positions
-        ally_flat = [coord for pos in ally_positions for coord in pos]
-        enemy_flat = [coord for pos in enemy_positions for coord in pos]
-
-        state = np.array([elixir / 10.0] + ally_flat + enemy_flat, dtype=np.float32)
+        self.last_predictions = predictions
+
+        if DEBUG:
+            print("RAW predictions:", predictions)
+            print("Detected classes:", [repr(p.get("class", "")) for p in predictions if isinstance(p, dict)])
+
+        # One pass over the predictions, then everything else is array work
+        units = [p for p in predictions if isinstance(p, dict) and "x" in p and "y" in p]
+        xy = np.array([(p["x"], p["y"]) for p in units], dtype=np.float32).reshape(-1, 2)
+        cls_ids = np.fromiter((class_id(p.get("class", "")) for p in units), dtype=np.int8, count=len(units))
+        allies = xy[cls_ids == ALLY_UNIT][:MAX_ALLIES]
+        enemies = xy[cls_ids == ENEMY_UNIT][:MAX_ENEMIES]
+
+        if DEBUG:
+            print("Allies:", allies.tolist())
+            print("Enemies:", enemies.tolist())
+
+        # Normalize to the field size; unused unit slots stay zero
+        state = np.zeros(self.state_size, dtype=np.float32)
+        state[0] = elixir / 10.0
+        ally_start, enemy_start = 1, 1 + 2 * MAX_ALLIES
+        np.multiply(allies, self._inv_field, out=state[ally_start:ally_start + allies.size].reshape(-1, 2))
+        np.multiply(enemies, self._inv_field, out=state[enemy_start:enemy_start + enemies.size].reshape(-1, 2))
+        self._enemy_count = len(enemies)
+        self._enemy_xy[:self._enemy_count] = enemies
         return state
 
+    def _run_workflow(self, workspace_name, workflow_id, images):
+        """
+        run_workflow on one image or a batch, returning the cached output when the
+        same pixels were sent to the same workflow recently
+        """
+        digest = hashlib.blake2b(workflow_id.encode(), digest_size=16)
+        for image in images if isinstance(images, list) else [images]:
+            digest.update(np.ascontiguousarray(image))
+        key = digest.digest()
+
+        with self._results_lock:
+            if key in self._results_cache:
+                self._results_cache.move_to_end(key)
+                return self._results_cache[key]
+
+        results = self.client.run_workflow(
+            workspace_name=workspace_name,
+            workflow_id=workflow_id,
+            images={"image": images}
+        )
+
+        with self._results_lock:
+            self._results_cache[key] = results
+            if len(self._results_cache) > self._results_cache_size:
+                self._results_cache.popitem(last=False)
+        return results
+
+    def _call_at(self, deadline, fn):
+        """Sleep until deadline (a time.monotonic() value), then return fn()"""
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return fn()
+
     def _compute_reward(self, state):
         if state is None:
             return 0
 
-        elixir = state[0] * 10
+        elixir = float(state[0] * 10)
 
         # Sum all enemy positions (not just the first)
         enemy_positions = state[1 + 2 * MAX_ALLIES:]  # All enemy x1, y1, x2, y2, ...
         # enemy_presence = sum(enemy_positions)
-        enemy_presence = sum(enemy_positions[1::2]) # Only y coords so it does not bias left/right side
+        enemy_presence = float(enemy_positions[1::2].sum())  # Only y coords so it does not bias left/right side
         reward = -enemy_presence
 
         # Elixir efficiency: reward for spending elixir if it reduces enemy presence
@@ -277,34 +348,30 @@ class ClashRoyaleEnv:
 
     def detect_cards_in_hand(self):
         try:
-            card_paths = self.actions.capture_individual_cards()
-            print("\nTesting individual card predictions:")
+            card_images = self.actions.capture_individual_cards(save=False)
+            if DEBUG:
+                print("\nTesting individual card predictions:")
 
             cards = []
-            workspace_name = os.getenv('WORKSPACE_CARD_DETECTION')
-            if not workspace_name:
-                raise ValueError("WORKSPACE_CARD_DETECTION environment variable is not set. Please check your .env file.")
-            
-            for card_path in card_paths:
-                results = self.card_model.run_workflow(
-                    workspace_name=workspace_name,
-                    workflow_id="custom-workflow",
-                    images={"image": card_path}
-                )
-                # print("Card detection raw results:", results)  # Debug print
+            # Send all four crops as one batch; the workflow returns one output per image, in order
+            results = self._run_workflow(self.card_workspace, "custom-workflow", card_images)
+            # print("Card detection raw results:", results)  # Debug print
 
+            for result in results:
                 # Fix: parse nested structure
                 predictions = []
-                if isinstance(results, list) and results:
-                    preds_dict = results[0].get("predictions", {})
+                if isinstance(result, dict):
+                    preds_dict = result.get("predictions", {})
                     if isinstance(preds_dict, dict):
                         predictions = preds_dict.get("predictions", [])
                 if predictions:
                     card_name = predictions[0]["class"]
-                    print(f"Detected card: {card_name}")
+                    if DEBUG:
+                        print(f"Detected card: {card_name}")
                     cards.append(card_name)
                 else:
-                    print("No card detected.")
+                    if DEBUG:
+                        print("No card detected.")
                     cards.append("Unknown")
             return cards
         except Exception as e:
@@ -312,42 +379,24 @@ class ClashRoyaleEnv:
             return []
 
     def get_available_actions(self):
-        """Generate all possible actions"""
-        actions = [
-            [card, x / (self.grid_width - 1), y / (self.grid_height - 1)]
-            for card in range(self.num_cards)
-            for x in range(self.grid_width)
-            for y in range(self.grid_height)
-        ]
-        actions.append([-1, 0, 0])  # No-op action
-        return actions
+        """Generate all possible actions as rows of (card, x_frac, y_frac), with the no-op last"""
+        cards = np.arange(self.num_cards)
+        xs = np.arange(self.grid_width) / (self.grid_width - 1)
+        ys = np.arange(self.grid_height) / (self.grid_height - 1)
+        grid = np.stack(np.meshgrid(cards, xs, ys, indexing="ij"), axis=-1).reshape(-1, 3)
+        no_op = np.array([[-1, 0, 0]])
+        return np.concatenate([grid, no_op]).astype(np.float32)
 
     def _endgame_watcher(self):
-        while not self._endgame_thread_stop.is_set():
+        # Poll often early on and back off as the match goes on; waiting on the
+        # stop event instead of sleeping lets close() end the thread immediately
+        interval = 0.5
+        while not self._endgame_thread_stop.wait(interval):
             result = self.actions.detect_game_end()
             if result:
                 self.game_over_flag = result
                 break
-            # Sleep a bit to avoid hammering the CPU
-            time.sleep(0.5)
+            interval = min(interval * 1.2, 2.0)
 
-    def _count_enemy_princess_towers(self):
-        self.actions.capture_area(self.screenshot_path)
-        
-        workspace_name = os.getenv('WORKSPACE_TROOP_DETECTION')
-        if not workspace_name:
-            raise ValueError("WORKSPACE_TROOP_DETECTION environment variable is not set. Please check your .env file.")
-        
-        results = self.rf_model.run_workflow(
-            workspace_name=workspace_name,
-            workflow_id="detect-count-and-visualize",
-            images={"image": self.screenshot_path}
-        )
-        predictions = []
-        if isinstance(results, dict) and "predictions" in results:
-            predictions = results["predictions"]
-        elif isinstance(results, list) and results:
-            first = results[0]
-            if isinstance(first, dict) and "predictions" in first:
-                predictions = first["predictions"]
-        return sum(1 for p in predictions if isinstance(p, dict) and p.get("class") == "enemy princess tower")
\ No newline at end of file
+    def _count_enemy_princess_towers(self, predictions):
+        return sum(1 for p in predictions if isinstance(p, dict) and class_id(p.get("class")) == ENEMY_PRINCESS_TOWER)